@@ -0,0 +1,74 @@
+import os
+from functools import lru_cache
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+from dotenv import load_dotenv
+
+# Shared API clients for every entry point (Q&A CLI, upload script).
+# Each getter builds its client once per process on a pooled keep-alive
+# transport and hands the same instance to all callers, so no code path
+# pays a fresh TLS handshake for its own copy.
+
+load_dotenv()
+
+
+@lru_cache(maxsize=1)
+def get_openai_client():
+    """Sync OpenAI client on a bounded keep-alive connection pool"""
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.Client(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            # The limits must ride on the transport: httpx ignores its
+            # limits argument once an explicit transport is supplied
+            transport=httpx.HTTPTransport(
+                retries=3,
+                limits=httpx.Limits(
+                    max_connections=100, max_keepalive_connections=20
+                )
+            )
+        )
+    )
+
+
+@lru_cache(maxsize=1)
+def get_aio_openai_client():
+    """
+    Async OpenAI client for high-concurrency batch work
+
+    The default httpx pool degrades past ~30 in-flight requests, so
+    this one gets a larger pool to keep concurrent batches flat.
+    """
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+    )
+
+
+@lru_cache(maxsize=1)
+def get_search_client():
+    """Azure Search client on a keep-alive transport with timeouts"""
+    return SearchClient(
+        endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+        index_name=os.getenv("AZURE_SEARCH_INDEX_NAME", "documents-index"),
+        credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_API_KEY")),
+        transport=RequestsTransport(connection_timeout=5, read_timeout=30)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_aio_search_client():
+    """Async twin of the Azure Search client for the batch pipeline"""
+    return AsyncSearchClient(
+        endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+        index_name=os.getenv("AZURE_SEARCH_INDEX_NAME", "documents-index"),
+        credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_API_KEY"))
+    )
@@ -1,9 +1,28 @@
+import argparse
+import asyncio
+import json
 import os
-from openai import OpenAI
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
+import random
+import re
+import threading
+import time
+from collections import deque, OrderedDict
+import tiktoken
+from openai import (
+    RateLimitError,
+    APIConnectionError,
+    APITimeoutError,
+)
 from dotenv import load_dotenv
 
+from clients import (
+    get_openai_client,
+    get_aio_openai_client,
+    get_search_client,
+    get_aio_search_client,
+)
+from semantic_cache import SemanticCache, get_corpus_version
+
 # Load environment variables
 load_dotenv()
 
@@ -11,41 +30,296 @@ print("=" * 60)
 print("🚀 INITIALIZING DOCUMENT Q&A SYSTEM")
 print("=" * 60)
 
-# Initialize OpenAI client
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+# Shared API clients (sync for interactive use, async for batch work);
+# see clients.py for the pooling configuration
+openai_client = get_openai_client()
+aio_openai_client = get_aio_openai_client()
 print("✅ OpenAI API connected")
 
-# Initialize Azure Search client
-search_client = SearchClient(
-    endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
-    index_name=os.getenv("AZURE_SEARCH_INDEX_NAME", "documents-index"),
-    credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_API_KEY"))
+# Max OpenAI calls in flight at once during batch processing
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "20"))
+
+# API budget: requests and tokens per minute (match your account tier)
+AI_RPM = int(os.getenv("AI_RPM", "500"))
+AI_TPM = int(os.getenv("AI_TPM", "200000"))
+
+# Transient errors worth retrying; anything else fails immediately
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError)
+MAX_RETRIES = 5
+
+# Decode budget per answer: grounded answers run well under 150 tokens
+# and decoding dominates request latency, so a tight cap bounds the
+# worst case. The stop sequences cut generation off early if the model
+# starts echoing the prompt structure or opening a new section, and
+# the fixed seed makes identical requests decode identical answers so
+# the exact-match caches stay coherent across restarts.
+ANSWER_MAX_TOKENS = 200
+ANSWER_STOP = ["\n\nQUESTION:", "\n\n**"]
+ANSWER_SEED = 42
+
+
+class RateLimiter:
+    """
+    Sliding-window limiter for requests-per-minute and tokens-per-minute
+
+    Keeps batch runs under the API rate limits so we never trip a 429
+    in the first place; the retry loop is only the fallback.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.request_times = deque()
+        self.token_spend = deque()  # (timestamp, tokens) pairs
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request slot and token budget are available"""
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                while self.request_times and now - self.request_times[0] > 60:
+                    self.request_times.popleft()
+                while self.token_spend and now - self.token_spend[0][0] > 60:
+                    self.token_spend.popleft()
+
+                tokens_used = sum(tokens for _, tokens in self.token_spend)
+                if len(self.request_times) < self.rpm and tokens_used < self.tpm:
+                    self.request_times.append(now)
+                    return
+
+                # Sleep until the oldest entry ages out of the window
+                oldest = self.request_times[0] if self.request_times else now
+                wait = max(60 - (now - oldest), 0.1)
+            await asyncio.sleep(wait)
+
+    async def record_usage(self, tokens):
+        """Charge actual token usage against the per-minute budget"""
+        async with self.lock:
+            self.token_spend.append((time.monotonic(), tokens))
+
+
+rate_limiter = RateLimiter(AI_RPM, AI_TPM)
+
+# Hard cap on context tokens pasted into the prompt; tokens beyond the
+# best-scoring chunks add cost and latency without improving answers
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+_encoder = None
+
+
+def _get_encoder():
+    """Tokenizer for gpt-4o-mini, created once and reused"""
+    global _encoder
+    if _encoder is None:
+        _encoder = tiktoken.encoding_for_model("gpt-4o-mini")
+    return _encoder
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after a TTL
+
+    Identical queries made seconds apart should not repeat a network
+    round trip. Bounded size, short TTL, near-free hits.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (timestamp, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if absent or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            timestamp, value = item
+            if time.monotonic() - timestamp > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Exact-match caches: identical searches repeated within a minute and
+# identical (question, context) generations repeated within 5 minutes
+search_cache = TTLCache(maxsize=1024, ttl=60)
+exact_answer_cache = TTLCache(maxsize=1024, ttl=300)
+
+# Whole-pipeline cache: a repeated question returns its prior answer
+# without touching the embedding, search, or completion APIs at all
+qa_cache = TTLCache(maxsize=1024, ttl=3600)
+
+
+def _embed_question(question):
+    """Embed a question for the semantic cache; None if the call fails"""
+    try:
+        response = openai_client.embeddings.create(
+            model="text-embedding-3-small",
+            input=question
+        )
+        return response.data[0].embedding
+    except Exception as e:
+        print(f"⚠️  Could not embed question for caching: {e}")
+        return None
+
+
+# Serves repeat questions (and close paraphrases) without touching
+# Azure Search or the completion API at all
+answer_cache = SemanticCache(_embed_question)
+
+# Topics we refuse to spend search/API calls on. Bare "password" is
+# deliberately absent: the password *policy* is legitimate handbook
+# content, and actual passwords aren't in the index, so such questions
+# fall through to the grounded "not found" path instead
+BLOCKED_KEYWORDS = [
+    "credential",
+    "credentials",
+    "api key",
+    "secret key",
+    "hack",
+    "exploit",
+    "bypass security",
+    "social security number",
+    "credit card number",
+]
+
+MAX_QUESTION_LENGTH = 500
+
+# One compiled alternation keeps screening a single C-level scan,
+# linear in question length no matter how long the blocklist grows.
+# IGNORECASE lets us scan the raw text without allocating a lowercased
+# copy of every question, and the word boundaries stop keywords from
+# matching inside harmless words ("hack" in "hackathon")
+_BLOCKED_RE = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, BLOCKED_KEYWORDS)) + r")\b",
+    re.IGNORECASE,
 )
-print("✅ Azure AI Search connected")
-print("=" * 60)
 
 
-def create_prompt(context, question):
+def is_question_safe(question):
     """
-    Create a structured prompt that enforces grounded answers
+    Screen a question before spending any API calls on it
 
-    This is YOUR responsibility as the system designer:
-    - Define what the AI can and cannot do
-    - Set clear boundaries
-    - Enforce safety constraints
+    Returns (True, None) when the question is fine, otherwise
+    (False, reason).
     """
-    prompt = f"""You are a helpful assistant that answers questions based ONLY on the provided company documents.
+    if len(question) > MAX_QUESTION_LENGTH:
+        return False, "question is too long"
+
+    match = _BLOCKED_RE.search(question)
+    if match:
+        return False, f"question touches a blocked topic ('{match.group(0)}')"
+
+    return True, None
+
+
+# Greetings and pleasantries that don't call for a document lookup
+_SMALL_TALK_RE = re.compile(
+    r"^\s*(?:hi|hiya|hello|hey|yo|thanks|thank you|ok|okay|cool|bye|"
+    r"goodbye|good (?:morning|afternoon|evening|night))[\s.!?]*$",
+    re.IGNORECASE,
+)
+
+SMALL_TALK_REPLY = (
+    "Hi! Ask me a question about the company documents "
+    "and I'll look it up for you."
+)
+
+
+def should_retrieve(question):
+    """
+    Decide whether a question needs document retrieval at all
+
+    Small talk ("hi", "thanks") and one- or two-word fragments can't be
+    answered from the documents anyway, so skipping retrieval for them
+    saves the embedding, search, and completion calls entirely.
+    """
+    if _SMALL_TALK_RE.match(question):
+        return False
+    if len(question.split()) < 3:
+        return False
+    return True
+
+
+# Phrases that signal the model answered from its own knowledge
+# instead of the supplied context
+HALLUCINATION_PHRASES = [
+    "as an ai",
+    "as a language model",
+    "i don't have access to",
+    "based on my knowledge",
+    "based on my training",
+    "as of my last update",
+    "in general, companies",
+    "typically, companies",
+]
+
+_HALLUCINATION_RE = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, HALLUCINATION_PHRASES)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def is_answer_grounded(answer):
+    """
+    Heuristic check that an answer stayed inside the provided context
+
+    A single compiled alternation scan rather than one substring pass
+    per phrase, so the cost stays flat as the phrase list grows.
+    """
+    return _HALLUCINATION_RE.search(answer) is None
+
+
+def _backoff_delay(attempt):
+    """Exponential backoff with jitter, capped at 30 seconds"""
+    return min(2 ** attempt + random.uniform(0, 1), 30)
+
+# Shared Azure Search clients; the async twin lets the batch pipeline
+# overlap retrieval across questions just like generation
+search_client = get_search_client()
+aio_search_client = get_aio_search_client()
+print("✅ Azure AI Search connected")
+print("=" * 60)
+
+
+# All static instructions live in one byte-identical system message so
+# OpenAI's automatic prompt caching can reuse the prefix across calls
+# (cheaper and faster once the cache is warm). Keep anything variable
+# out of this string.
+SYSTEM_PROMPT = """You are a helpful document assistant that answers questions based ONLY on the provided company documents.
 
 **STRICT RULES:**
-1. Answer ONLY using information from the CONTEXT below
+1. Answer ONLY using information from the CONTEXT provided by the user
 2. If the answer is not in the CONTEXT, you MUST say: "Not found in the documents"
 3. Do not make up information or use external knowledge
 4. Be concise and accurate
-5. Quote relevant parts when helpful
+5. Quote relevant parts when helpful"""
+
+
+def create_prompt(context, question):
+    """
+    Create the user message for a single grounded question
 
-**CONTEXT:**
+    The rules block lives in SYSTEM_PROMPT; here only the variable
+    parts remain, with the context (stable across related questions)
+    ahead of the question to maximize shared prompt prefixes.
+    """
+    prompt = f"""**CONTEXT:**
 {context}
 
 **QUESTION:**
@@ -56,10 +330,43 @@ def create_prompt(context, question):
     return prompt
 
 
+def _select_context(hits):
+    """
+    Assemble (context, sources) from scored (score, content, source) hits
+
+    Keeps the best-scoring chunks up to the context token budget,
+    truncating the last one at a clean token boundary.
+    """
+    hits = sorted(hits, key=lambda hit: hit[0], reverse=True)
+
+    encoder = _get_encoder()
+    remaining = CONTEXT_TOKEN_BUDGET
+    context_parts = []
+    # dict keys dedupe like a set but keep insertion order, so sources
+    # list out in relevance order instead of arbitrarily
+    sources = {}
+
+    for score, content, source in hits:
+        tokens = encoder.encode(content)
+        if len(tokens) > remaining:
+            if remaining > 0:
+                context_parts.append(encoder.decode(tokens[:remaining]))
+                sources[source] = None
+            break
+        context_parts.append(content)
+        sources[source] = None
+        remaining -= len(tokens)
+
+    return "\n\n".join(context_parts), list(sources)
+
+
 def search_documents(question):
     """
     Search Azure AI Search for relevant document chunks
 
+    Returns (context, sources): the combined chunk text and the set of
+    source documents it came from.
+
     This demonstrates the enterprise approach:
     - Documents are indexed and searchable
     - Not just dumping entire PDFs to the AI
@@ -67,33 +374,459 @@ def search_documents(question):
     """
     print(f"\n🔍 Searching documents for: '{question}'")
 
+    # The corpus version is part of the key, so entries cached against
+    # an older document set simply stop matching after an upload
+    cache_key = (question.strip().lower(), get_corpus_version())
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        print("⚡ Search results served from cache")
+        return cached
+
     try:
         # Search for top 3 most relevant chunks
         results = search_client.search(
             search_text=question,
             top=3,
-            select=["content", "source"]
+            select=["content", "source"],
+            include_total_count=False
         )
 
-        # Combine results into context
-        context_parts = []
-        sources = set()
-
-        for result in results:
-            context_parts.append(result['content'])
-            sources.add(result['source'])
+        context, sources = _select_context(
+            (result.get('@search.score', 0.0), result['content'], result['source'])
+            for result in results
+        )
 
-        if context_parts:
-            context = "\n\n".join(context_parts)
+        if context:
             print(f"✅ Found relevant content from: {', '.join(sources)}")
-            return context
+            search_cache.put(cache_key, (context, sources))
+            return context, sources
         else:
             print("⚠️  No relevant documents found")
-            return "No relevant documents found."
+            return "No relevant documents found.", []
 
     except Exception as e:
         print(f"❌ Error searching documents: {e}")
-        return f"Error searching documents: {str(e)}"
+        return f"Error searching documents: {str(e)}", []
+
+
+async def _asearch_documents(question):
+    """Async twin of search_documents, used by the batch pipeline"""
+    cache_key = (question.strip().lower(), get_corpus_version())
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        results = await aio_search_client.search(
+            search_text=question,
+            top=3,
+            select=["content", "source"],
+            include_total_count=False
+        )
+        hits = []
+        async for result in results:
+            hits.append(
+                (result.get('@search.score', 0.0), result['content'], result['source'])
+            )
+
+        context, sources = _select_context(hits)
+        if not context:
+            return "No relevant documents found.", []
+
+        search_cache.put(cache_key, (context, sources))
+        return context, sources
+
+    except Exception as e:
+        print(f"❌ Error searching documents: {e}")
+        return f"Error searching documents: {str(e)}", []
+
+
+def create_bulk_prompt(items):
+    """
+    Pack several (question, context) pairs into one numbered prompt
+
+    Resending the rules block once for K questions instead of K times
+    cuts input tokens (and cost) by roughly K for bulk workloads.
+    """
+    numbered = "\n\n".join(
+        f"CONTEXT {i}:\n{context}\n\nQUESTION {i}:\n{question}"
+        for i, (question, context) in enumerate(items, 1)
+    )
+
+    prompt = f"""You are a helpful assistant that answers questions based ONLY on the provided company documents.
+
+**STRICT RULES:**
+1. Answer each QUESTION using ONLY information from its matching CONTEXT
+2. If an answer is not in its CONTEXT, you MUST say: "Not found in the documents"
+3. Do not make up information or use external knowledge
+4. Be concise and accurate
+5. Quote relevant parts when helpful
+
+{numbered}
+
+Return a JSON object of the form {{"answers": [{{"id": 1, "answer": "..."}}, ...]}} with one entry per question."""
+
+    return prompt
+
+
+def generate_answers_bulk(items, batch_size=10):
+    """
+    Answer many (question, context) pairs with few API calls
+
+    Questions are packed batch_size at a time into a single chat
+    completion that returns a JSON array. Falls back to per-question
+    calls for any batch whose JSON comes back malformed.
+    """
+    answers = []
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        print(f"🤖 Generating answers {start + 1}-{start + len(batch)} of {len(items)}...")
+
+        # Screen questions first so blocked ones never reach the API;
+        # results is positional so the returned list stays aligned
+        results = [None] * len(batch)
+        safe_items = []
+        for pos, (question, context) in enumerate(batch):
+            safe, reason = is_question_safe(question)
+            if safe:
+                safe_items.append((pos, question, context))
+            else:
+                print(f"🛑 Question blocked: {reason}")
+                results[pos] = "I can't help with that question."
+
+        try:
+            if safe_items:
+                response = openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful document assistant. You ONLY answer based on provided context."
+                        },
+                        {
+                            "role": "user",
+                            "content": create_bulk_prompt(
+                                [(q, c) for _, q, c in safe_items]
+                            )
+                        }
+                    ],
+                    response_format={"type": "json_object"},
+                    max_tokens=500 * len(safe_items),
+                    temperature=0.2
+                )
+
+                parsed = json.loads(response.choices[0].message.content)
+                by_id = {entry["id"]: entry["answer"] for entry in parsed["answers"]}
+                # Materialize before assigning: a lazy generator would
+                # fill the ids it found before a missing one raises, and
+                # the fallback below would then answer them a second time
+                batch_answers = [by_id[i] for i in range(1, len(safe_items) + 1)]
+                for (pos, _, _), answer in zip(safe_items, batch_answers):
+                    results[pos] = answer
+
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            # Malformed batch response: fall back to one call per question
+            print(f"⚠️  Bulk response failed validation ({e}), retrying individually")
+            for pos, question, context in safe_items:
+                results[pos] = generate_answer(question, context)
+
+        except Exception as e:
+            print(f"❌ Error getting bulk answers: {e}")
+            for pos, _, _ in safe_items:
+                results[pos] = f"Error generating answer: {str(e)}"
+
+        # Ground-check each generated answer, as get_answer does
+        for pos, _, _ in safe_items:
+            answer = results[pos]
+            if (not answer.startswith("Error generating answer")
+                    and not is_answer_grounded(answer)):
+                print("⚠️  Answer failed the grounding check, discarding it")
+                results[pos] = "Not found in the documents"
+
+        answers.extend(results)
+
+    return answers
+
+
+def submit_batch(items, jsonl_path="batch_requests.jsonl"):
+    """
+    Submit a large offline question set to the OpenAI Batch API
+
+    For overnight or bulk evaluation runs the real-time API is the
+    wrong tool: the Batch API costs 50% less and completes within 24h.
+    Writes one chat.completions request per (question, context) pair
+    to a JSONL file, uploads it, and returns the batch id.
+    """
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for i, (question, context) in enumerate(items):
+            line = {
+                "custom_id": f"question-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": "gpt-4o-mini",
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": create_prompt(context, question)
+                        }
+                    ],
+                    "max_tokens": 500,
+                    "temperature": 0.2
+                }
+            }
+            f.write(json.dumps(line) + "\n")
+
+    print(f"📤 Uploading {len(items)} requests from {jsonl_path}...")
+    with open(jsonl_path, "rb") as f:
+        batch_file = openai_client.files.create(
+            file=f,
+            purpose="batch"
+        )
+    batch = openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"✅ Batch submitted: {batch.id}")
+    return batch.id
+
+
+def poll_batch(batch_id):
+    """
+    Check a submitted batch; return answers keyed by custom_id when done
+
+    Returns None while the batch is still in progress so callers can
+    poll on their own schedule (these jobs can take hours).
+    """
+    batch = openai_client.batches.retrieve(batch_id)
+    print(f"📋 Batch {batch_id} status: {batch.status}")
+
+    if batch.status != "completed":
+        if batch.status in ("failed", "expired", "cancelled"):
+            print(f"❌ Batch ended without completing: {batch.status}")
+        return None
+
+    output = openai_client.files.content(batch.output_file_id)
+    answers = {}
+    for line in output.text.splitlines():
+        result = json.loads(line)
+        answers[result["custom_id"]] = (
+            result["response"]["body"]["choices"][0]["message"]["content"]
+        )
+
+    print(f"✅ Retrieved {len(answers)} answers")
+    return answers
+
+
+def generate_answer(question, context):
+    """
+    Generate a grounded answer for a single question (synchronous)
+
+    Used by the interactive flow where questions arrive one at a time.
+    """
+    cache_key = (question.strip().lower(), hash(context))
+    cached_answer = exact_answer_cache.get(cache_key)
+    if cached_answer is not None:
+        print("⚡ Answer served from cache")
+        return cached_answer
+
+    prompt = create_prompt(context, question)
+
+    print("🤖 Generating answer...")
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_tokens=ANSWER_MAX_TOKENS,
+                temperature=0.2,  # Low temperature = more focused, less creative
+                stop=ANSWER_STOP,
+                seed=ANSWER_SEED
+            )
+
+            answer = response.choices[0].message.content
+            print("✅ Answer generated")
+
+            # Surface server-side prompt-cache reuse so prefix-cache
+            # regressions (e.g. a variable sneaking into the system
+            # message) are visible in the output
+            usage = getattr(response, "usage", None)
+            details = getattr(usage, "prompt_tokens_details", None)
+            if details and getattr(details, "cached_tokens", 0):
+                print(f"⚡ Prompt cache reused {details.cached_tokens} tokens")
+
+            exact_answer_cache.put(cache_key, answer)
+            return answer
+
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_RETRIES - 1:
+                print(f"❌ Error getting answer (gave up after {MAX_RETRIES} attempts): {e}")
+                return f"Error generating answer: {str(e)}"
+            delay = _backoff_delay(attempt)
+            print(f"⚠️  Transient API error, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+        except Exception as e:
+            print(f"❌ Error getting answer: {e}")
+            return f"Error generating answer: {str(e)}"
+
+
+async def _generate_one(question, context, semaphore):
+    """Generate one answer under the shared concurrency limit"""
+    prompt = create_prompt(context, question)
+
+    async with semaphore:
+        for attempt in range(MAX_RETRIES):
+            await rate_limiter.acquire()
+            try:
+                response = await aio_openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    max_tokens=ANSWER_MAX_TOKENS,
+                    temperature=0.2,
+                    stop=ANSWER_STOP,
+                    seed=ANSWER_SEED
+                )
+                if response.usage:
+                    await rate_limiter.record_usage(response.usage.total_tokens)
+                return response.choices[0].message.content
+
+            except RETRYABLE_ERRORS as e:
+                if attempt == MAX_RETRIES - 1:
+                    print(f"❌ Error getting answer (gave up after {MAX_RETRIES} attempts): {e}")
+                    return f"Error generating answer: {str(e)}"
+                delay = _backoff_delay(attempt)
+                print(f"⚠️  Transient API error, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+            except Exception as e:
+                print(f"❌ Error getting answer: {e}")
+                return f"Error generating answer: {str(e)}"
+
+
+async def generate_answers_batch(questions, contexts):
+    """
+    Generate answers for many questions concurrently
+
+    The workload is I/O-bound on API latency, so fanning the calls out
+    with asyncio.gather (bounded by a semaphore so we stay under rate
+    limits) finishes in roughly the time of the slowest single call
+    instead of the sum of all of them.
+    """
+    semaphore = asyncio.Semaphore(AI_CONCURRENCY)
+    tasks = [
+        _generate_one(question, context, semaphore)
+        for question, context in zip(questions, contexts)
+    ]
+    return await asyncio.gather(*tasks)
+
+
+# One long-lived event loop for every synchronous batch wrapper.
+# asyncio.run would create and close a fresh loop per call, but the
+# rate limiter's asyncio.Lock and the pooled async clients bind to the
+# loop that first awaits them — a second asyncio.run in the same
+# process would find them bound to a closed loop and raise.
+_async_loop = None
+
+
+def _run_async(coro):
+    """Run a coroutine to completion on the shared event loop"""
+    global _async_loop
+    if _async_loop is None:
+        _async_loop = asyncio.new_event_loop()
+    return _async_loop.run_until_complete(coro)
+
+
+def generate_answers(questions, contexts):
+    """Synchronous convenience wrapper around generate_answers_batch"""
+    return _run_async(generate_answers_batch(questions, contexts))
+
+
+# Generous per-question deadline covering retrieval plus generation
+# (with retries); one stuck question shouldn't hang a whole batch
+QUESTION_TIMEOUT = 30
+
+
+async def _answer_one(question, semaphore):
+    """Retrieve context and generate the answer for one question
+
+    Runs the same screening and grounding guards as the interactive
+    path, so batch runs can't slip past them.
+    """
+    safe, reason = is_question_safe(question)
+    if not safe:
+        print(f"🛑 Question blocked: {reason}")
+        return "I can't help with that question."
+
+    context, sources = await _asearch_documents(question)
+
+    if "Error" in context or "No relevant documents" in context:
+        return "I couldn't find relevant information in the documents to answer your question."
+
+    answer = await _generate_one(question, context, semaphore)
+
+    if not is_answer_grounded(answer):
+        print("⚠️  Answer failed the grounding check, discarding it")
+        return "Not found in the documents"
+
+    return answer
+
+
+async def answer_questions_batch(questions):
+    """
+    Answer many questions end to end, concurrently
+
+    Both the Azure Search retrieval and the OpenAI generation are
+    async here, so neither stage blocks the others; a batch finishes
+    in roughly the time of its slowest question.
+    """
+    semaphore = asyncio.Semaphore(AI_CONCURRENCY)
+    tasks = [
+        asyncio.wait_for(_answer_one(question, semaphore), timeout=QUESTION_TIMEOUT)
+        for question in questions
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    answers = []
+    for result in results:
+        if isinstance(result, str):
+            answers.append(result)
+        elif isinstance(result, asyncio.TimeoutError):
+            # str() of a TimeoutError is empty; say what actually happened
+            answers.append(
+                f"Error generating answer: timed out after {QUESTION_TIMEOUT}s"
+            )
+        else:
+            answers.append(f"Error generating answer: {result!r}")
+    return answers
+
+
+def answer_questions(questions):
+    """Synchronous convenience wrapper around answer_questions_batch"""
+    return _run_async(answer_questions_batch(questions))
 
 
 def get_answer(question):
@@ -107,61 +840,213 @@ def get_answer(question):
     4. Return grounded response
     """
 
+    # Screen the question before spending any network calls on it
+    safe, reason = is_question_safe(question)
+    if not safe:
+        print(f"🛑 Question blocked: {reason}")
+        return "I can't help with that question."
+
+    # Small talk needs no documents: reply without touching the APIs
+    if not should_retrieve(question):
+        return SMALL_TALK_REPLY
+
+    # Exact repeat of a recent question: answer straight from cache
+    qa_key = (question.strip().lower(), get_corpus_version())
+    cached_answer = qa_cache.get(qa_key)
+    if cached_answer is not None:
+        print("⚡ Answer served from cache")
+        return cached_answer
+
+    # Step 0: Look for a semantically similar past question; a hit is
+    # only served after fresh retrieval confirms it below
+    candidate, embedding = answer_cache.lookup(question)
+
     # Step 1: Search for relevant context
-    context = search_documents(question)
+    context, sources = search_documents(question)
 
     # Handle search errors
     if "Error" in context or "No relevant documents" in context:
         return "I couldn't find relevant information in the documents to answer your question."
 
-    # Step 2: Create the prompt with constraints
+    # Serve the semantic hit only if it still rests on the same
+    # sources the fresh retrieval returned (guards against the corpus
+    # having drifted since the answer was cached)
+    if candidate is not None and answer_cache.is_entry_valid(candidate, sources):
+        print("⚡ Answer served from semantic cache")
+        return candidate["answer"]
+
+    # Step 2 & 3: Build the constrained prompt and get the AI answer
+    answer = generate_answer(question, context)
+
+    # Step 4: Reject answers that drifted outside the documents
+    if not is_answer_grounded(answer):
+        print("⚠️  Answer failed the grounding check, discarding it")
+        return "Not found in the documents"
+
+    # Cache successful answers for future repeat and similar questions
+    if not answer.startswith("Error generating answer"):
+        qa_cache.put(qa_key, answer)
+        answer_cache.store(embedding, answer, sources)
+
+    return answer
+
+
+def generate_answer_stream(question, context):
+    """
+    Generate a grounded answer, printing tokens as they decode
+
+    With stream=True the first words reach the terminal after roughly
+    the time-to-first-token (~200ms) instead of the full decode time.
+    Returns the complete answer text.
+    """
+    cache_key = (question.strip().lower(), hash(context))
+    cached_answer = exact_answer_cache.get(cache_key)
+    if cached_answer is not None:
+        print("⚡ Answer served from cache")
+        print(f"\n💡 Answer:\n{cached_answer}")
+        return cached_answer
+
     prompt = create_prompt(context, question)
 
-    # Step 3: Send to OpenAI
     print("🤖 Generating answer...")
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful document assistant. You ONLY answer based on provided context."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            max_tokens=500,
-            temperature=0.2  # Low temperature = more focused, less creative
-        )
+    for attempt in range(MAX_RETRIES):
+        started = False  # once tokens are printed, a retry would repeat them
+        try:
+            response = openai_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                max_tokens=ANSWER_MAX_TOKENS,
+                temperature=0.2,
+                stop=ANSWER_STOP,
+                seed=ANSWER_SEED,
+                stream=True
+            )
+
+            parts = []
+            for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not started:
+                        print("\n💡 Answer:")
+                        started = True
+                    parts.append(delta)
+                    print(delta, end="", flush=True)
+
+            print()
+            answer = "".join(parts)
+            exact_answer_cache.put(cache_key, answer)
+            return answer
+
+        except RETRYABLE_ERRORS as e:
+            if started or attempt == MAX_RETRIES - 1:
+                print(f"\n❌ Error getting answer: {e}")
+                return f"Error generating answer: {str(e)}"
+            delay = _backoff_delay(attempt)
+            print(f"⚠️  Transient API error, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+        except Exception as e:
+            print(f"\n❌ Error getting answer: {e}")
+            return f"Error generating answer: {str(e)}"
+
+
+def get_answer_stream(question):
+    """
+    Interactive variant of get_answer that streams the answer text
 
-        answer = response.choices[0].message.content
-        print("✅ Answer generated")
+    Runs the same pipeline — screening, caches, retrieval, grounding —
+    but prints the answer as it arrives (including on cache hits), so
+    callers should not print the returned answer again.
+    """
+    safe, reason = is_question_safe(question)
+    if not safe:
+        print(f"🛑 Question blocked: {reason}")
+        answer = "I can't help with that question."
+        print(f"\n💡 Answer:\n{answer}")
         return answer
 
-    except Exception as e:
-        print(f"❌ Error getting answer: {e}")
-        return f"Error generating answer: {str(e)}"
+    if not should_retrieve(question):
+        print(f"\n💡 Answer:\n{SMALL_TALK_REPLY}")
+        return SMALL_TALK_REPLY
 
+    qa_key = (question.strip().lower(), get_corpus_version())
+    cached_answer = qa_cache.get(qa_key)
+    if cached_answer is not None:
+        print("⚡ Answer served from cache")
+        print(f"\n💡 Answer:\n{cached_answer}")
+        return cached_answer
 
-def run_test_questions():
-    """Run a set of test questions to demonstrate the system"""
+    candidate, embedding = answer_cache.lookup(question)
+    context, sources = search_documents(question)
 
-    test_questions = [
-        "How many days before should I request leave?",
-        "How many sick leave days do I get per year?",
-        "Can I carry forward unused annual leave?",
-        "What time should I arrive at work?",
-        "What is the CEO's salary?",  # This should return "not found"
-        "How much is the gym membership reimbursement?"
-    ]
+    if "Error" in context or "No relevant documents" in context:
+        answer = "I couldn't find relevant information in the documents to answer your question."
+        print(f"\n💡 Answer:\n{answer}")
+        return answer
+
+    if candidate is not None and answer_cache.is_entry_valid(candidate, sources):
+        print("⚡ Answer served from semantic cache")
+        print(f"\n💡 Answer:\n{candidate['answer']}")
+        return candidate["answer"]
+
+    answer = generate_answer_stream(question, context)
+
+    if not is_answer_grounded(answer):
+        print("⚠️  Answer failed the grounding check, discarding it")
+        answer = "Not found in the documents"
+        print(f"\n💡 Answer:\n{answer}")
+        return answer
+
+    if not answer.startswith("Error generating answer"):
+        qa_cache.put(qa_key, answer)
+        answer_cache.store(embedding, answer, sources)
+
+    return answer
+
+
+TEST_QUESTIONS = [
+    "How many days before should I request leave?",
+    "How many sick leave days do I get per year?",
+    "Can I carry forward unused annual leave?",
+    "What time should I arrive at work?",
+    "What is the CEO's salary?",  # This should return "not found"
+    "How much is the gym membership reimbursement?"
+]
+
+
+def run_test_questions(interactive=True):
+    """
+    Run a set of test questions to demonstrate the system
+
+    With interactive=False (CI/benchmark runs) all questions go
+    through the concurrent batch pipeline at once — finishing in
+    roughly the time of the slowest question — and results print at
+    the end with no keypress gates.
+    """
 
     print("\n" + "=" * 60)
     print("🧪 RUNNING TEST QUESTIONS")
     print("=" * 60)
 
-    for i, question in enumerate(test_questions, 1):
+    if not interactive:
+        answers = answer_questions(TEST_QUESTIONS)
+        for i, (question, answer) in enumerate(zip(TEST_QUESTIONS, answers), 1):
+            print(f"\n--- Test {i} ---")
+            print(f"❓ Question: {question}")
+            print(f"💡 Answer: {answer}")
+            print("-" * 60)
+        return
+
+    for i, question in enumerate(TEST_QUESTIONS, 1):
         print(f"\n--- Test {i} ---")
         print(f"❓ Question: {question}")
         answer = get_answer(question)
@@ -190,14 +1075,26 @@ def interactive_mode():
             print("⚠️  Please enter a question.\n")
             continue
 
-        answer = get_answer(question)
-        print(f"\n💡 Answer:\n{answer}\n")
+        get_answer_stream(question)
+        print()
         print("-" * 60)
 
 
 def main():
     """Main entry point"""
 
+    parser = argparse.ArgumentParser(description="Enterprise Document Q&A System")
+    parser.add_argument(
+        "--non-interactive",
+        action="store_true",
+        help="run the test questions concurrently and exit (for CI/benchmarks)"
+    )
+    args = parser.parse_args()
+
+    if args.non_interactive:
+        run_test_questions(interactive=False)
+        return
+
     print("\n" + "=" * 60)
     print("📚 ENTERPRISE DOCUMENT Q&A SYSTEM")
     print("=" * 60)
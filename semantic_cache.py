@@ -0,0 +1,141 @@
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Monotonic corpus version, persisted beside the code so the upload
+# script (a separate process) can invalidate caches in the Q&A app
+_VERSION_FILE = Path(__file__).with_name(".corpus_version")
+
+
+def get_corpus_version():
+    """Current corpus version; bumped whenever documents are uploaded"""
+    try:
+        return int(_VERSION_FILE.read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_corpus_version():
+    """Record that the document corpus changed, invalidating cached answers"""
+    version = get_corpus_version() + 1
+    _VERSION_FILE.write_text(str(version))
+    return version
+
+
+def _jaccard(a, b):
+    """Jaccard similarity of two sets"""
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by question-embedding similarity
+
+    Employees ask near-duplicate questions all day ("What's the PTO
+    policy?" vs "How many vacation days do I get?"). Exact string
+    matching misses those, so this cache embeds each question and
+    serves a stored answer when a past question is close enough in
+    embedding space. A hit is only served after fresh retrieval
+    confirms the stored sources (see is_entry_valid), so it skips the
+    completion call — the dominant cost — but not the search.
+
+    Embeddings are stored as an L2-normalized float32 matrix so a
+    lookup is a single vectorized matrix-vector product.
+    """
+
+    def __init__(self, embed_fn, threshold=0.92, ttl=3600, maxsize=1024,
+                 source_overlap=0.6):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.source_overlap = source_overlap
+        self.vectors = None  # (N, dim) float32, rows L2-normalized
+        self.entries = []    # parallel list of {answer, sources, timestamp}
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def lookup(self, question):
+        """
+        Look up an entry for a semantically similar past question
+
+        Returns (entry, embedding); entry is None on a miss, otherwise
+        a dict with the cached answer and the sources it was grounded
+        on — callers must confirm with is_entry_valid before serving
+        it. The embedding is returned so the caller can pass it back
+        to store() without paying for a second embedding call.
+        """
+        embedding = self.embed_fn(question)
+        if embedding is None:
+            return None, None
+
+        query = self._normalize(embedding)
+        if self.vectors is None or len(self.entries) == 0:
+            return None, query
+
+        scores = self.vectors @ query
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            return None, query
+
+        entry = self.entries[best]
+        if time.monotonic() - entry["timestamp"] > self.ttl:
+            self._evict(best)
+            return None, query
+
+        # Lazily evict answers cached against an older corpus: the
+        # documents have changed since, so the answer can't be trusted
+        if entry["corpus_version"] != get_corpus_version():
+            self._evict(best)
+            return None, query
+
+        return entry, query
+
+    def is_entry_valid(self, entry, sources):
+        """
+        Check a hit against the sources fresh retrieval just returned
+
+        Question similarity alone can serve a stale answer after the
+        document corpus shifts under it; requiring substantial overlap
+        between the entry's sources and the current retrieval guards
+        against that drift.
+        """
+        return _jaccard(entry["sources"], set(sources)) >= self.source_overlap
+
+    def store(self, embedding, answer, sources):
+        """Remember an answer, and the sources that ground it, under its
+        question embedding"""
+        if embedding is None:
+            return
+
+        if len(self.entries) >= self.maxsize:
+            self._evict(0)  # drop the oldest entry
+
+        row = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        if self.vectors is None:
+            self.vectors = row
+        else:
+            self.vectors = np.vstack([self.vectors, row])
+        self.entries.append({
+            "answer": answer,
+            "sources": set(sources),
+            "corpus_version": get_corpus_version(),
+            "timestamp": time.monotonic()
+        })
+
+    def _evict(self, index):
+        self.vectors = np.delete(self.vectors, index, axis=0)
+        del self.entries[index]
+
+    def clear(self):
+        """Drop all entries (call after the document index changes)"""
+        self.vectors = None
+        self.entries = []
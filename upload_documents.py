@@ -1,100 +1,414 @@
+import math
+import multiprocessing
 import os
-from azure.search.documents import SearchClient
+import threading
+from hashlib import blake2b
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+import pypdfium2 as pdfium
+from azure.search.documents import SearchIndexingBufferedSender
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
     SearchIndex,
     SimpleField,
     SearchableField,
-    SearchFieldDataType
+    SearchField,
+    SearchFieldDataType,
+    VectorSearch,
+    HnswAlgorithmConfiguration,
+    VectorSearchProfile
 )
 from azure.core.credentials import AzureKeyCredential
 from dotenv import load_dotenv
 
+from clients import get_openai_client
+from semantic_cache import bump_corpus_version
+
 # Load environment variables
 load_dotenv()
 
-print("="*60)
-print("📤 UPLOADING DOCUMENTS TO AZURE AI SEARCH")
-print("="*60)
 
-# Get credentials from environment
-endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
-api_key = os.getenv("AZURE_SEARCH_API_KEY")
-index_name = os.getenv("AZURE_SEARCH_INDEX_NAME", "documents-index")
+# Below this page count it's not worth paying process start-up cost
+PARALLEL_PDF_THRESHOLD = 10
 
-print(f"\n🔗 Connecting to: {endpoint}")
-print(f"📇 Index name: {index_name}")
+# PDFium is not thread-safe, and several file-worker threads parse
+# small PDFs in-process concurrently; every in-process pdfium call
+# serializes behind this lock (the extraction worker processes each
+# have their own interpreter and don't contend)
+_pdfium_lock = threading.Lock()
 
-# Initialize index client
-index_client = SearchIndexClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(api_key)
+# One process pool shared by every extraction, created lazily on the
+# first large PDF. A pool per document would start a fresh set of
+# workers each time and, with several file threads running, stack
+# more processes than there are cores.
+#
+# The pool comes to life while file-worker threads and the buffered
+# sender's flush thread are running, and fork()ing a multithreaded
+# process is deadlock-prone in the children — so workers start from a
+# clean process via forkserver (spawn on Windows, which has no fork).
+_MP_START_METHOD = (
+    "forkserver"
+    if "forkserver" in multiprocessing.get_all_start_methods()
+    else "spawn"
 )
 
-# Define the search index schema
-fields = [
-    SimpleField(
-        name="id",
-        type=SearchFieldDataType.String,
-        key=True,
-        filterable=True
-    ),
-    SearchableField(
-        name="content",
-        type=SearchFieldDataType.String,
-        searchable=True
-    ),
-    SimpleField(
-        name="source",
-        type=SearchFieldDataType.String,
-        filterable=True
-    )
-]
-
-index = SearchIndex(name=index_name, fields=fields)
-
-# Create or update the index
-try:
-    result = index_client.create_or_update_index(index)
-    print(f"\n✅ Index '{index_name}' created/updated successfully!")
-except Exception as e:
-    print(f"\n❌ Error creating index: {e}")
-    exit(1)
-
-# Initialize search client for uploading documents
-search_client = SearchClient(
-    endpoint=endpoint,
-    index_name=index_name,
-    credential=AzureKeyCredential(api_key)
-)
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+
+def _get_extract_pool():
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(_MP_START_METHOD)
+            )
+        return _extract_pool
+
+
+def _extract_page_range(args):
+    """
+    Extract one contiguous page range (runs in a worker process)
+
+    PDF handles aren't picklable, so each worker reopens the file.
+    """
+    file_path, start, end = args
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return "\n\n".join(
+            pdf[i].get_textpage().get_text_range() for i in range(start, end)
+        )
+    finally:
+        pdf.close()
+
+
+def extract_text_from_txt(file_path):
+    """Read a plain-text document"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# Chunking parameters (in words): big enough for coherent context,
+# with overlap so facts straddling a boundary appear in both chunks
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+
+def iter_document_pages(file_path):
+    """
+    Yield a document's text one page at a time
+
+    Building the full text with repeated string concatenation is
+    quadratic in page count and holds the whole document in memory;
+    yielding pages lets chunking and upload start immediately and
+    keeps peak memory at one page (plus the chunk buffer).
+    Plain-text files arrive as a single page.
+    """
+    file_path = Path(file_path)
+    if file_path.suffix.lower() != ".pdf":
+        yield extract_text_from_txt(file_path)
+        return
+
+    # Small PDFs are parsed in-process: extract the pages under the
+    # pdfium lock (rather than yielding under it, which would hold it
+    # across the consumer's embedding and upload work)
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            num_pages = len(pdf)
+            if num_pages <= PARALLEL_PDF_THRESHOLD:
+                pages = [
+                    pdf[i].get_textpage().get_text_range()
+                    for i in range(num_pages)
+                ]
+            else:
+                pages = None
+        finally:
+            pdf.close()
+
+    if pages is not None:
+        yield from pages
+        return
+
+    # Large PDF: fan page ranges out across worker processes and yield
+    # range results as they stream back (map preserves order)
+    workers = os.cpu_count() or 1
+    pages_per_worker = math.ceil(num_pages / workers)
+    ranges = [
+        (str(file_path), start, min(start + pages_per_worker, num_pages))
+        for start in range(0, num_pages, pages_per_worker)
+    ]
+    yield from _get_extract_pool().map(_extract_page_range, ranges)
+
+
+def chunk_text_stream(pages, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Stream overlapping chunks from an iterable of page texts
+
+    Maintains a rolling word buffer and emits each chunk as soon as it
+    fills, so the full document text is never materialized.
+    """
+    step = chunk_size - overlap
+    buffer = []
+    total_words = 0
+    covered_words = 0  # words already included in an emitted chunk
+
+    for page in pages:
+        words = page.split()
+        buffer.extend(words)
+        total_words += len(words)
+
+        while len(buffer) >= chunk_size:
+            yield " ".join(buffer[:chunk_size])
+            covered_words = total_words - (len(buffer) - chunk_size)
+            del buffer[:step]
+
+    # Flush the tail, unless every word in it was already emitted
+    if total_words > covered_words:
+        yield " ".join(buffer)
+
+
+# Embedding settings: sub-batches keep each request comfortably under
+# the per-item token limits while still amortizing the round trip
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_BATCH_SIZE = 96
+
+openai_client = get_openai_client()
+
+
+def embed_texts(texts):
+    """
+    Embed many texts with one API call per 96-item sub-batch
+
+    One HTTP round trip per sub-batch instead of one per chunk; the
+    API embeds the whole input list server-side, so multi-chunk files
+    ingest several times faster than embedding chunk by chunk.
+    """
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        response = openai_client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts[start:start + EMBEDDING_BATCH_SIZE]
+        )
+        vectors.extend(item.embedding for item in response.data)
+    return vectors
+
+
+def attach_embeddings(batch):
+    """Add a content_vector to every document in an upload batch"""
+    vectors = embed_texts([doc["content"] for doc in batch])
+    for doc, vector in zip(batch, vectors):
+        doc["content_vector"] = vector
+    return batch
+
+
+# Files are processed by a handful of worker threads; the work is
+# I/O-bound (PDF parse, embedding calls, uploads), so overlapping
+# files hides most of the per-file latency
+FILE_WORKERS = 8
+
+# Keeps progress lines from interleaving across worker threads
+_print_lock = threading.Lock()
 
-# Read the sample policy document
-doc_path = "documents/sample_policy.txt"
-
-try:
-    with open(doc_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    print(f"\n📄 Read document: {doc_path}")
-    print(f"   Length: {len(content)} characters")
-except FileNotFoundError:
-    print(f"\n❌ Error: File not found at {doc_path}")
-    print("   Please create the file first!")
-    exit(1)
-
-# Prepare document for upload
-documents = [{
-    "id": "doc-001",
-    "content": content,
-    "source": "Employee Handbook 2024"
-}]
-
-# Upload to Azure Search
-try:
-    result = search_client.upload_documents(documents=documents)
-    print(f"\n✅ Successfully uploaded {len(documents)} document(s)!")
-    print("\n" + "="*60)
-    print("🎉 SETUP COMPLETE! You can now run main.py")
+# Chunk hashes already queued this run, shared across worker threads so
+# identical content (duplicate files, boilerplate pages) is embedded
+# and indexed only once
+_seen_hashes = set()
+_seen_lock = threading.Lock()
+
+
+def chunk_id(chunk):
+    """
+    Stable document id derived from the chunk's content
+
+    Hashing the content (instead of numbering chunks per file) makes
+    ingestion idempotent: re-running the script upserts the same ids,
+    and an unchanged chunk never produces a new index entry.
+    """
+    return blake2b(chunk.encode(), digest_size=16).hexdigest()
+
+
+def _on_upload_error(action):
+    """Called by the buffered sender when a document exhausts its retries"""
+    with _print_lock:
+        print(f"⚠️  Failed to index document: {action}")
+
+
+# File types iter_document_pages knows how to read
+ALLOWED_EXTENSIONS = frozenset({".pdf", ".txt"})
+
+
+def upload_document(file_path, sender):
+    """
+    Chunk one document and stream its chunks into the index
+
+    Pages feed the chunker, chunks are embedded a sub-batch at a time
+    and handed to the buffered sender, which batches, pipelines, and
+    retries the indexing requests itself. The full text is never held
+    in memory. Returns the number of chunks queued.
+    """
+    file_path = Path(file_path)
+    with _print_lock:
+        print(f"\n📄 Processing document: {file_path}")
+    total_queued = 0
+    batch = []
+
+    for chunk in chunk_text_stream(iter_document_pages(file_path)):
+        doc_id = chunk_id(chunk)
+        with _seen_lock:
+            if doc_id in _seen_hashes:
+                continue
+            _seen_hashes.add(doc_id)
+        batch.append({
+            "id": doc_id,
+            "content": chunk,
+            "source": file_path.name
+        })
+        if len(batch) >= EMBEDDING_BATCH_SIZE:
+            sender.upload_documents(documents=attach_embeddings(batch))
+            total_queued += len(batch)
+            batch = []
+
+    if batch:
+        sender.upload_documents(documents=attach_embeddings(batch))
+        total_queued += len(batch)
+
+    with _print_lock:
+        print(f"   Queued {total_queued} chunk(s) from {file_path.name}")
+    return total_queued
+
+
+def main():
+    """
+    Create/update the search index and upload every document
+
+    Kept out of module scope so the process-pool workers (which
+    re-import this module under the spawn and forkserver start
+    methods) don't each kick off their own upload run.
+    """
+    print("="*60)
+    print("📤 UPLOADING DOCUMENTS TO AZURE AI SEARCH")
     print("="*60)
-except Exception as e:
-    print(f"\n❌ Error uploading documents: {e}")
-    exit(1)
\ No newline at end of file
+
+    # Get credentials from environment
+    endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
+    api_key = os.getenv("AZURE_SEARCH_API_KEY")
+    index_name = os.getenv("AZURE_SEARCH_INDEX_NAME", "documents-index")
+
+    print(f"\n🔗 Connecting to: {endpoint}")
+    print(f"📇 Index name: {index_name}")
+
+    # Initialize index client
+    index_client = SearchIndexClient(
+        endpoint=endpoint,
+        credential=AzureKeyCredential(api_key)
+    )
+
+    # Define the search index schema
+    fields = [
+        SimpleField(
+            name="id",
+            type=SearchFieldDataType.String,
+            key=True,
+            filterable=True
+        ),
+        SearchableField(
+            name="content",
+            type=SearchFieldDataType.String,
+            searchable=True
+        ),
+        SimpleField(
+            name="source",
+            type=SearchFieldDataType.String,
+            filterable=True
+        ),
+        SearchField(
+            name="content_vector",
+            type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+            searchable=True,
+            vector_search_dimensions=EMBEDDING_DIMENSIONS,
+            vector_search_profile_name="vector-profile"
+        )
+    ]
+
+    # HNSW (approximate) vector search over the chunk embeddings
+    vector_search = VectorSearch(
+        algorithms=[HnswAlgorithmConfiguration(name="hnsw")],
+        profiles=[
+            VectorSearchProfile(
+                name="vector-profile",
+                algorithm_configuration_name="hnsw"
+            )
+        ]
+    )
+
+    index = SearchIndex(name=index_name, fields=fields, vector_search=vector_search)
+
+    # Create or update the index
+    try:
+        result = index_client.create_or_update_index(index)
+        print(f"\n✅ Index '{index_name}' created/updated successfully!")
+    except Exception as e:
+        print(f"\n❌ Error creating index: {e}")
+        exit(1)
+
+    # Upload every supported document in the documents/ folder
+    docs_dir = Path("documents")
+
+    # One recursive walk instead of a glob pass per extension (and now
+    # covering subfolders); resolving paths deduplicates files that are
+    # reachable twice via symlinks
+    seen = set()
+    all_files = []
+    for path in sorted(docs_dir.rglob("*")):
+        if path.suffix.lower() in ALLOWED_EXTENSIONS and path.is_file():
+            real_path = path.resolve()
+            if real_path not in seen:
+                seen.add(real_path)
+                all_files.append(path)
+
+    if not all_files:
+        print(f"\n❌ Error: No documents found in {docs_dir}/")
+        print("   Please add some files first!")
+        exit(1)
+
+    try:
+        # One buffered sender shared across all files: it splits queued
+        # documents into right-sized batches, pipelines concurrent
+        # requests, and retries transient failures on its own
+        with SearchIndexingBufferedSender(
+            endpoint=endpoint,
+            index_name=index_name,
+            credential=AzureKeyCredential(api_key),
+            auto_flush_interval=5,
+            initial_batch_action_count=512,
+            on_error=_on_upload_error
+        ) as sender:
+            # Process files in parallel; the sender is shared and thread-safe
+            with ThreadPoolExecutor(max_workers=FILE_WORKERS) as executor:
+                futures = {
+                    executor.submit(upload_document, file_path, sender): file_path
+                    for file_path in all_files
+                }
+                total_uploaded = sum(
+                    future.result() for future in as_completed(futures)
+                )
+
+        # The corpus changed: bump the version so answers cached against
+        # the old documents stop being served
+        bump_corpus_version()
+
+        print(f"\n✅ Successfully uploaded {total_uploaded} chunk(s) "
+              f"from {len(all_files)} file(s)!")
+        print("\n" + "="*60)
+        print("🎉 SETUP COMPLETE! You can now run main.py")
+        print("="*60)
+    except Exception as e:
+        print(f"\n❌ Error uploading documents: {e}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()